@@ -15,6 +15,9 @@
 import os
 import sys
 import argparse
+import functools
+import io
+import multiprocessing
 
 # Import vkapi from parent directory
 currentdir = os.path.dirname(os.path.realpath(__file__))
@@ -25,6 +28,8 @@ import vkapi  # noqa
 
 # Map base C types to flatbuffer types
 c_to_fb = {
+    # TODO output parameters or arrays?
+    'void': 'ubyte',
     'char': 'ubyte',
     'float': 'float',
     'double': 'double',
@@ -48,57 +53,76 @@ c_to_fb = {
     'VkDeviceAddress': 'ulong',
 }
 
+# Map Vulkan type classes to their flatbuffer conversion.
+# Keyed on the exact class, so a single dict lookup replaces a chain of
+# isinstance tests for every field.
+type_to_fb = {
+    vkapi.DynamicArray:
+        lambda field, ftype: '[' + parameter_to_flatbuffer(
+            field, ftype.base_type) + ']',
+    vkapi.Pointer:
+        lambda field, ftype: parameter_to_flatbuffer(field, ftype.base_type),
+    # TODO builtin should have a base type? based on typedef?
+    vkapi.Bitmask:
+        lambda field, ftype: 'uint',
+    # Function pointers are treated as opaque 64bit values.
+    vkapi.FunctionPtr:
+        lambda field, ftype: 'ulong',
+}
+
 
 # Converts a parameter (or struct member) to a flat buffer entry.
 def parameter_to_flatbuffer(field, ftype):
   # TODO: Should fixed arrays be listed here?
-  if isinstance(ftype, vkapi.DynamicArray):
-    return '[' + parameter_to_flatbuffer(field, ftype.base_type) + ']'
+  handler = type_to_fb.get(type(ftype))
+  if handler is not None:
+    return handler(field, ftype)
 
-  if isinstance(ftype, vkapi.Pointer):
-    return parameter_to_flatbuffer(field, ftype.base_type)
+  fb = ftype.name
+  return c_to_fb.get(fb, fb)
 
-  # TODO output parameters or arrays?
-  if ftype.name == 'void':
-    return 'ubyte'
 
-  # TODO builtin should have a base type? based on typedef?
-  if isinstance(ftype, vkapi.Bitmask):
-    return 'uint'
+# Returns the {name:int} values of an enum, computed once per enum.
+@functools.lru_cache(maxsize=None)
+def enum_integer_values(enum):
+  return enum.get_integer_values()
 
-  # Function pointers are treated as opaque 64bit values.
-  if isinstance(ftype, vkapi.FunctionPtr):
-    return 'ulong'
 
-  fb = ftype.name
-  if fb in c_to_fb:
-    fb = c_to_fb[fb]
+# Determine the default value of an enum type, computed once per enum.
+@functools.lru_cache(maxsize=None)
+def enum_default_value(enum):
+  # Empty enums are given a default 0 value when converted.
+  if len(enum.values) == 0:
+    return None
 
-  return fb
+  # Return the lowest value if no 0.
+  iv = enum_integer_values(enum)
+  if 0 not in iv.values():
+    return str(min(iv.values()))
+
+  return None
 
 
 # Determine the default value of the member.
 # This is mostly relevant for enums with out 0 values as 0 is considered
 # a valid default
 def field_default_value(field):
-  if field.type is None:
+  ftype = field.type
+  if ftype is None:
     return None
 
-  if isinstance(field.type, vkapi.Enum):
-    # Empty enums are given a default 0 value when converted.
-    if len(field.type.values) == 0:
-      return None
-
-    # Return the lowest value if no 0.
-    iv = field.type.get_integer_values()
-    if 0 not in iv.values():
-      return str(min(iv.values()))
+  if isinstance(ftype, vkapi.Enum):
+    return enum_default_value(ftype)
 
   return None
 
 
-# Prints a member of a struct (or command parameter) table
-def print_field(field):
+# The printers below write the schema with `emit`, which is called with each
+# piece of generated text.
+
+
+# Emits a member of a struct (or command parameter) table
+def print_field(emit, field):
   s = f'    {field.name}: {parameter_to_flatbuffer(field, field.type)}'
 
   # FlatBuffer scalars (enums) with no 0 value must specify a default.
@@ -110,79 +134,66 @@ def print_field(field):
   #    if not m.is_optional and isinstance(mtype, vkapi.Struct):
   #        s = s + ' (required)'
 
-  s = s + ';'
-  print(s)
+  emit(s + ';\n')
 
 
-def print_struct(t):
+# Emits a table with a field per member (or command parameter).
+def print_table(emit, name, fields):
+  emit('table ' + name + ' {\n')
+  for f in fields:
+    # TODO decide to make (required)
+    print_field(emit, f)
+  emit('}\n\n')
+
+
+def print_struct(emit, t):
+  name = t.name
+
   # VkClearColorValue is an enum of arrays, FlatBuffers just can't easily
   # represent this as a union, so we consider it a fixed byte array.
-  if t.name == 'VkClearColorValue':
-    print('struct VkClearColorValue {')
-    print('    values: [ubyte:32];')
-    print('}')
-    print()
+  if name == 'VkClearColorValue':
+    emit('struct VkClearColorValue {\n'
+         '    values: [ubyte:32];\n'
+         '}\n'
+         '\n')
     return
 
   # TODO decide if struct, native struct or table
-  if t.is_union:
-    # We consider unions a table and treat non-union as optional.
-    print('table ' + t.name + ' {')
-  else:
-    print('table ' + t.name + ' {')
+  # We consider unions a table and treat non-union as optional.
+  print_table(emit, name, t.members)
 
-  for m in t.members:
-    # TODO decide to make (required)
-    print_field(m)
-  print('}')
-  print()
 
+def print_handle(emit, h):
+  emit('struct ' + h.name + ' {\n'
+       '    handle: ulong;\n'
+       '}\n'
+       '\n')
 
-def print_handle(h):
-  print('struct ' + h.name + ' {')
-  print('    handle: ulong;')
-  print('}')
-  print()
 
-
-def print_enum(e):
+def print_enum(emit, e):
   # FlatBuffer enums must have unique values.
   # So we create a value->name map then iterate on that.
 
-  iv = e.get_integer_values()
+  name = e.name
+  iv = enum_integer_values(e)
   bitwidth = e.bitwidth
-  value_to_name = {}
-  for ev in e.values:
-    v = iv[ev]
-    value_to_name[v] = ev
+  value_to_name = {iv[ev]: ev for ev in e.values}
 
   # Vulkan spec has bitmasks VkFlags typedef'd to XxxFlags.
   # The values however are as enum XxxFlagBits.
   # For flatbuffers we just rename the enum to match the VkFlags
   # named types.
-  if bitwidth == 32:
-    print('enum ' + e.name + ': int {')
-  else:
-    print('enum ' + e.name + ': int64 {')
+  int_type = 'int' if bitwidth == 32 else 'int64'
 
+  body = ''.join(f'\t{vname} = {v}, \n' for (v, vname) in value_to_name.items())
   if len(value_to_name) == 0:
-    print('\tNONE')
-
-  for ev in value_to_name:
-    print('\t' + value_to_name[ev] + ' = ' + str(ev) + ', ')
-  print('}')
-  print()
+    body = '\tNONE\n'
 
+  emit(f'enum {name}: {int_type} {{\n{body}}}\n\n')
 
-def print_command(c):
-  tname = c.name + 'Params'
-  print('table ' + tname + ' {')
 
-  for p in c.parameters:
-    # TODO decide to make (required)
-    print_field(p)
-  print('}')
-  print()
+def print_command(emit, c):
+  print_table(emit, c.name + 'Params', c.parameters)
 
 
 # Main routine - setup Jinja and
@@ -192,6 +203,11 @@ parser.add_argument("-p",
                     "--platform",
                     help="target platforms for the layer[win32, xcb, ggp, ...]",
                     nargs='+')
+parser.add_argument("-j",
+                    "--jobs",
+                    help="number of processes used to emit the schema",
+                    type=int,
+                    default=1)
 
 args = parser.parse_args()
 
@@ -213,24 +229,53 @@ if args.platform is not None:
 print(f'Platforms: {platforms}')
 registry = vkapi.Registry(specfile, platforms=platforms)
 
-print("namespace vcr;")
-print()
-
-parsed = {}
-for t in registry.types:
+# Every type and command is emitted independently, so the work is collected
+# into a list of (printer, item) pairs that can be split between processes.
+items = []
+seen_ids = set()
+for t in registry.types.values():
 
   # Aliased types can create duplicates, only write once.
-  if t in parsed:
+  if id(t) in seen_ids:
     continue
-  parsed[t] = t
+  seen_ids.add(id(t))
 
   if isinstance(t, vkapi.Enum):
-    print_enum(t)
+    items.append((print_enum, t))
   elif isinstance(t, vkapi.Struct):
-    print_struct(t)
+    items.append((print_struct, t))
   elif isinstance(t, vkapi.Handle):
-    print_handle(t)
+    items.append((print_handle, t))
 
 commands = vkapi.resolve_aliases(registry.commands)
 for c in commands.values():
-  print_command(c)
+  items.append((print_command, c))
+
+
+# Emits items[start:stop] and returns the generated schema text.
+# The schema is accumulated in memory and written to stdout in one go.
+# Workers are forked, so they share `items` and only the bounds and the
+# resulting text cross the process boundary.
+def emit_items(bounds):
+  out = io.StringIO()
+  for (printer, item) in items[bounds[0]:bounds[1]]:
+    printer(out.write, item)
+  return out.getvalue()
+
+
+jobs = args.jobs
+if jobs > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+  print('Warning: fork is not supported, emitting the schema serially.',
+        file=sys.stderr)
+  jobs = 1
+
+if jobs > 1 and items:
+  # Contiguous chunks keep the output in the same order as a serial run.
+  step = -(-len(items) // jobs)
+  chunks = [(i, i + step) for i in range(0, len(items), step)]
+  with multiprocessing.get_context('fork').Pool(jobs) as pool:
+    schema = ''.join(pool.map(emit_items, chunks))
+else:
+  schema = emit_items((0, len(items)))
+
+sys.stdout.write('namespace vcr;\n\n' + schema)
@@ -18,10 +18,12 @@
 # This is meant to be an example of how to use the vkcodgen registry with
 # a variety of different template techniques.
 
-import jinja2
 import argparse
 import os
+import shutil
+import subprocess
 import sys
+from types import MappingProxyType
 
 currentdir = os.path.dirname(os.path.realpath(__file__))
 vkspecgendir = os.path.dirname(os.path.dirname(currentdir))
@@ -29,26 +31,45 @@ sys.path.append(vkspecgendir)
 
 import vkapi  # noqa
 
-
-def visit_type(t: vkapi.TypeModifier, visited: dict):
-  if t.name not in visited:
+# Type modifiers that wrap a single referenced base type.
+indirect_types = (vkapi.Pointer, vkapi.DynamicArray, vkapi.FixedArray)
+
+
+# Adds `t` and the types it references to `visited`.
+# Walks the type graph with an explicit stack; structs are marked visited
+# before their members so self-referencing structs terminate.
+# `seen_ids` holds the id() of every type object already walked, which is
+# cheaper to test than the (computed) type name.
+def visit_type(t: vkapi.TypeModifier, visited: dict, seen_ids: set):
+  stack = [t]
+  while stack:
+    t = stack.pop()
+    if id(t) in seen_ids:
+      continue
+    seen_ids.add(id(t))
     if isinstance(t, vkapi.Struct):
-      for p in t.members:
-        visit_type(p.type, visited)
       visited[t.name] = t
-    elif isinstance(t, vkapi.Pointer) or isinstance(
-        t, vkapi.DynamicArray) or isinstance(t, vkapi.FixedArray):
-      visit_type(t.base_type, visited)
+      # Reversed so members are visited in declaration order.
+      stack.extend(reversed([p.type for p in t.members]))
+    elif isinstance(t, indirect_types):
+      stack.append(t.base_type)
     else:
       visited[t.name] = t
 
 
 # Return the set of types referenced by a command list.
+# `seen_ids` is shared by the whole walk, so every command and every type
+# object (including structs shared between many commands) is visited once.
+# Aliased commands share their Command object and are skipped.
 def referenced_types(commands: list):
   visited = {}
+  seen_ids = set()
   for cmd in commands:
+    if id(cmd) in seen_ids:
+      continue
+    seen_ids.add(id(cmd))
     for p in cmd.parameters:
-      visit_type(p.type, visited)
+      visit_type(p.type, visited, seen_ids)
 
   return visited
 
@@ -85,45 +106,59 @@ registry = vkapi.Registry(specfile, platforms=platforms)
 types = referenced_types(registry.commands.values())
 
 # Create a Jinja2 templating environment
+# jinja2 is imported here so --help and a missing spec file don't pay for it.
+import jinja2  # noqa
+
+# Compiled templates are cached on disk (in the system temp directory) so
+# repeated runs skip template compilation.
 env = vkapi.JinjaEnvironment(
     registry,
-    loader=jinja2.FileSystemLoader(searchpath=f'{currentdir}/templates'))
-
-platform_structs = {
-    k: [t for t in v.types.values() if isinstance(t, vkapi.Struct)
-       ] for (k, v) in registry.platforms.items()
-}
-
-parameters = {
-    'enums': [t for t in types.values() if isinstance(t, vkapi.Enum)],
+    loader=jinja2.FileSystemLoader(searchpath=f'{currentdir}/templates'),
+    bytecode_cache=jinja2.FileSystemBytecodeCache())
+
+# The template parameters are computed once and shared, read-only, by every
+# template render.
+platform_structs = MappingProxyType({
+    k: tuple(t for t in v.types.values() if isinstance(t, vkapi.Struct))
+    for (k, v) in registry.platforms.items()
+})
+
+parameters = MappingProxyType({
+    'enums': tuple(t for t in types.values() if isinstance(t, vkapi.Enum)),
     'platform_structs': platform_structs,
     'layer_prefix': 'Printer',
-}
+})
 
 generated_dir = f'{currentdir}/generated'
-templates_dir = f'{currentdir}/templates'
 os.makedirs(generated_dir, exist_ok=True)
-tmp = env.from_string(open(f'{templates_dir}/layerprint.cc.jinja2').read())
-out = tmp.render(parameters)
-with open(f'{generated_dir}/print.cc', 'w') as text_file:
-  text_file.write(out)
-
-tmp = env.from_string(open(f'{templates_dir}/layer_base.cc.jinja2').read())
-out = tmp.render(parameters)
-with open(f'{generated_dir}/layer_base.cc', 'w') as text_file:
-  text_file.write(out)
-
-tmp = env.from_string(open(f'{templates_dir}/dispatch.h.jinja2').read())
-out = tmp.render(parameters)
-with open(f'{generated_dir}/dispatch.h', 'w') as text_file:
-  text_file.write(out)
-
-tmp = env.from_string(open(f'{templates_dir}/dispatch.cc.jinja2').read())
-out = tmp.render(parameters)
-with open(f'{generated_dir}/dispatch.cc', 'w') as text_file:
-  text_file.write(out)
-
-os.system(f'clang-format -i -style=google {generated_dir}/print.cc')
-os.system(f'clang-format -i -style=google {generated_dir}/layer_base.cc')
-os.system(f'clang-format -i -style=google {generated_dir}/dispatch.h')
-os.system(f'clang-format -i -style=google {generated_dir}/dispatch.cc')
+
+# Generated file name for each template.
+generated_files = {
+    'layerprint.cc.jinja2': 'print.cc',
+    'layer_base.cc.jinja2': 'layer_base.cc',
+    'dispatch.h.jinja2': 'dispatch.h',
+    'dispatch.cc.jinja2': 'dispatch.cc',
+}
+
+clang_format = shutil.which('clang-format')
+if clang_format is None:
+  print('Warning: clang-format not found, generated files are not formatted.')
+
+# Each generated file gets its own clang-format process as soon as it is
+# written, so the files are formatted in parallel with each other and with
+# rendering the remaining templates.
+formatters = []
+for (template_name, file_name) in generated_files.items():
+  tmp = env.get_template(template_name)
+  out = tmp.render(parameters)
+  with open(f'{generated_dir}/{file_name}', 'w') as text_file:
+    text_file.write(out)
+  if clang_format is not None:
+    formatters.append(
+        subprocess.Popen([
+            clang_format, '-i', '-style=google', f'{generated_dir}/{file_name}'
+        ]))
+
+for formatter in formatters:
+  if formatter.wait() != 0:
+    raise subprocess.CalledProcessError(formatter.returncode, formatter.args)
@@ -211,7 +211,51 @@ def TestHandleDestroyCommand(registry_file):
   assert vkResetDescriptorPool.handle_param is None
 
 
+def TestCommandInfo(registry_file):
+  r = Registry(registry_file,
+               platforms=['', 'android', 'ggp'],
+               authors=['', 'KHR', 'EXT', 'ANDROID', 'GGP'],
+               blocked_extensions=[
+                   'VK_KHR_acceleration_structure',
+                   'VK_KHR_ray_tracing_pipeline'
+               ])
+  hi = HandleInfoGlobals(r)
+
+  ci = hi.command_info(r.commands['vkCreateInstance'])
+  assert ci.kind == 'create'
+  assert ci.handle_info is hi.handle_info('VkInstance')
+  assert ci.create_cmd is hi.handle_info('VkInstance').create_cmds[0]
+  assert hi.command_info(r.commands['vkCreateInstance']) is ci
+
+  ci = hi.command_info(r.commands['vkAllocateDescriptorSets'])
+  assert ci.kind == 'pool_allocate'
+  assert ci.handle_info is hi.handle_info('VkDescriptorSet')
+  assert hi.command_info(r.commands['vkGetDeviceQueue']).kind == 'get'
+
+  ci = hi.command_info(r.commands['vkFreeDescriptorSets'])
+  assert ci.kind == 'destroy'
+  assert ci.handle_info is hi.handle_info('VkDescriptorSet')
+  assert ci.create_cmd is None
+
+  ci = hi.command_info(r.commands['vkResetDescriptorPool'])
+  assert ci.kind == 'reset_pool'
+  assert ci.handle_info is hi.handle_info('VkDescriptorSet')
+
+  assert hi.command_info(r.commands['vkQueueSubmit']) is None
+
+  # command_info agrees with the is_*_command predicates.
+  for cmd in r.commands.values():
+    ci = hi.command_info(cmd)
+    kind = ci.kind if ci is not None else None
+    assert hi.is_create_command(cmd) == (kind == 'create')
+    assert hi.is_pool_allocate_command(cmd) == (kind == 'pool_allocate')
+    assert hi.is_get_command(cmd) == (kind == 'get')
+    assert hi.is_destroy_command(cmd) == (kind == 'destroy')
+    assert hi.is_reset_pool_command(cmd) == (kind == 'reset_pool')
+
+
 registry_file=sys.argv[1] if len(sys.argv) > 1 else 'vk.xml'
 TestHandleInfo(registry_file)
 TestHandleCreateCommand(registry_file)
 TestHandleDestroyCommand(registry_file)
+TestCommandInfo(registry_file)
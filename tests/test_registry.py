@@ -15,7 +15,7 @@
 import xml.etree.ElementTree as ET
 import os
 import sys
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 # Import vkapi from parent directory
 currentdir = os.path.dirname(os.path.realpath(__file__))
@@ -24,76 +24,95 @@ sys.path.append(parentdir)
 
 from vkapi import *  # noqa
 
+# Registries parsed so far, keyed on their constructor arguments.
+registries = {}
+
+
+# Returns the registry for the given arguments, parsing it only once per
+# configuration in each process. The tests never modify a registry, so they
+# can share them.
+def LoadRegistry(registry_file, **kwargs):
+  key = (registry_file,) + tuple((k, tuple(v) if isinstance(v, list) else v)
+                                 for (k, v) in sorted(kwargs.items()))
+  if key not in registries:
+    registries[key] = Registry(registry_file, **kwargs)
+  return registries[key]
+
 
 # TODO proper test framework
 def TestParser(registry_file):
-  r = Registry(registry_file,
-               platforms=['', 'android', 'ggp'],
-               authors=['', 'KHR', 'EXT', 'ANDROID', 'GGP'],
-               allowed_extensions=['VK_KHR_acceleration_structure'])
+  r = LoadRegistry(registry_file,
+                   platforms=['', 'android', 'ggp'],
+                   authors=['', 'KHR', 'EXT', 'ANDROID', 'GGP'],
+                   allowed_extensions=['VK_KHR_acceleration_structure'])
+  types = r.types
+  commands = r.commands
 
   # Confirm handle parents make sense.
-  assert r.types['VkInstance'].is_instance_handle
-  assert not r.types['VkInstance'].is_device_handle
+  assert types['VkInstance'].is_instance_handle
+  assert not types['VkInstance'].is_device_handle
 
-  assert not r.types['VkDevice'].is_instance_handle
-  assert r.types['VkDevice'].is_device_handle
+  assert not types['VkDevice'].is_instance_handle
+  assert types['VkDevice'].is_device_handle
 
-  assert r.types['VkCommandPool'].is_device_handle
+  assert types['VkCommandPool'].is_device_handle
 
-  assert r.types['VkSurfaceKHR'].is_instance_handle
-  assert r.types['VkSwapchainKHR'].is_device_handle
+  assert types['VkSurfaceKHR'].is_instance_handle
+  assert types['VkSwapchainKHR'].is_device_handle
 
   # Basic type checks
-  pdp = r.types["VkPhysicalDeviceProperties"]
+  pdp = types["VkPhysicalDeviceProperties"]
   assert pdp is not None and isinstance(pdp, Struct)
-  pcuuid = next(m for m in pdp.members if m.name == 'pipelineCacheUUID')
+  pcuuid = pdp.find_member('pipelineCacheUUID')
   assert isinstance(pcuuid.type, FixedArray)
   assert pcuuid.type.length == 'VK_UUID_SIZE'
 
   # Check some array and string array parsing.
-  dci = r.types["VkDeviceCreateInfo"]
+  dci = types["VkDeviceCreateInfo"]
 
-  pqci = next(m for m in dci.members if m.name == 'pQueueCreateInfos')
+  pqci = dci.find_member('pQueueCreateInfos')
   assert isinstance(pqci.type, DynamicArray)
   assert pqci.type.length == 'queueCreateInfoCount'
   assert pqci.type.name == 'ConstDynamicArray(VkDeviceQueueCreateInfo)'
 
-  een = next(m for m in dci.members if m.name == 'ppEnabledExtensionNames')
+  een = dci.find_member('ppEnabledExtensionNames')
   assert isinstance(een.type, DynamicArray)
   assert een.type.length == 'enabledExtensionCount'
   assert een.type.name == 'ConstDynamicArray(string)'
 
   # Do some sanity checks using VkMemoryRequirements2 as it's got
   # aliases, extensions and promotions.
-  assert 'VkMemoryRequirements2' in r.types
+  assert 'VkMemoryRequirements2' in types
 
   # Command checks.
-  assert r.commands['vkCreateInstance'].is_instance
-  assert r.commands['vkEnumeratePhysicalDevices'].is_instance
-  assert not r.commands['vkCmdDraw'].is_instance
+  ci = commands['vkCreateInstance']
+  assert ci.is_instance
+  assert commands['vkEnumeratePhysicalDevices'].is_instance
+  assert not commands['vkCmdDraw'].is_instance
 
   # Enum and enum values
   # Check that aliases are all valid and point to enum values
   # VkStructureType is one of the more complex with aliases to aliases
   # and promotions and such. So we just check this one works.
-  st = r.types['VkStructureType']
-  for ev in st.values.values():
-    assert isinstance(ev, EnumValue) or isinstance(ev, TypeAlias) and (
-        isinstance(ev.alias, EnumValue) or isinstance(ev.alias, TypeAlias))
+  st = types['VkStructureType']
+  enum_value_types = (EnumValue, TypeAlias)
+  assert all(
+      isinstance(ev, EnumValue) or
+      isinstance(ev, TypeAlias) and isinstance(ev.alias, enum_value_types)
+      for ev in st.values.values())
 
   stiv = st.get_integer_values()
   for iv in stiv:
     assert isinstance(stiv[iv], int)
 
   # Check return types
-  assert r.commands['vkCreateInstance'].return_type.name == 'VkResult'
-  assert r.commands['vkCmdDraw'].return_type.name == 'void'
-  assert r.commands[
+  assert ci.return_type.name == 'VkResult'
+  assert commands['vkCmdDraw'].return_type.name == 'void'
+  assert commands[
       'vkGetBufferDeviceAddress'].return_type.name == 'VkDeviceAddress'
 
   # Pointer to pointer checks
-  mm = r.commands['vkMapMemory']
+  mm = commands['vkMapMemory']
   assert isinstance(mm.parameters[5].type, Pointer)
   assert not mm.parameters[5].type.is_const
   assert isinstance(mm.parameters[5].type.base_type, Pointer)
@@ -102,7 +121,7 @@ def TestParser(registry_file):
   assert mm.parameters[5].type.base_type.base_type.name == 'void'
 
   # Const pointer to pointec checks
-  bas = r.commands['vkCmdBuildAccelerationStructuresKHR']
+  bas = commands['vkCmdBuildAccelerationStructuresKHR']
   assert isinstance(bas.parameters[3].type, DynamicArray)
   assert bas.parameters[3].type.is_const
   assert isinstance(bas.parameters[3].type.base_type, Pointer)
@@ -111,16 +130,16 @@ def TestParser(registry_file):
       3].type.base_type.base_type.name == 'VkAccelerationStructureBuildRangeInfoKHR'
 
   # String type check
-  ipa = r.commands['vkGetInstanceProcAddr']
+  ipa = commands['vkGetInstanceProcAddr']
   assert ipa.parameters[1].type.name == 'string'
 
   # Array type check
-  bc = r.commands['vkCmdSetBlendConstants']
+  bc = commands['vkCmdSetBlendConstants']
   assert isinstance(bc.parameters[1].type, FixedArray)
   assert bc.parameters[1].type.length == 4
 
   # 2-dimensional array type check
-  tm = r.types['VkTransformMatrixKHR']
+  tm = types['VkTransformMatrixKHR']
   assert isinstance(tm.members[0].type, FixedArray)
   assert tm.members[0].type.length == 3
   assert isinstance(tm.members[0].type.base_type, FixedArray)
@@ -128,7 +147,6 @@ def TestParser(registry_file):
   assert tm.members[0].type.base_type.base_type.name == 'float'
 
   # String array checks
-  ci = r.commands['vkCreateInstance']
   assert ci.parameters[0].name == 'pCreateInfo'
   assert isinstance(ci.parameters[0].type, Pointer)
   ici = ci.parameters[0].type.base_type
@@ -136,31 +154,31 @@ def TestParser(registry_file):
   assert ici.members[5].type.name == 'ConstDynamicArray(string)'
 
   # Bit field checks
-  asi = r.types['VkAccelerationStructureInstanceKHR']
+  asi = types['VkAccelerationStructureInstanceKHR']
   assert asi.members[0].bit_size is None
   assert asi.members[1].bit_size == 24
 
   # Output pointer check
-  ci = r.commands['vkCreateImage']
+  ci = commands['vkCreateImage']
   assert isinstance(ci.parameters[3].type, Pointer)
   assert ci.parameters[3].is_output
 
   # Output array check
-  ads = r.commands['vkAllocateDescriptorSets']
+  ads = commands['vkAllocateDescriptorSets']
   assert isinstance(ads.parameters[2].type, DynamicArray)
   assert ads.parameters[2].is_output
 
   # Non-output array of handles check
-  bvb = r.commands['vkCmdBindVertexBuffers']
+  bvb = commands['vkCmdBindVertexBuffers']
   assert isinstance(bvb.parameters[3].type, DynamicArray)
   assert not bvb.parameters[3].is_output
 
   # Successcodes check
-  gfs = r.commands['vkGetFenceStatus']
-  assert Counter(gfs.successcodes) == Counter(['VK_SUCCESS', 'VK_NOT_READY'])
+  gfs = commands['vkGetFenceStatus']
+  assert set(gfs.successcodes) == {'VK_SUCCESS', 'VK_NOT_READY'}
 
   # EnumVal comment check
-  ot = r.types['VkSwapchainCreateFlagBitsKHR']
+  ot = types['VkSwapchainCreateFlagBitsKHR']
   assert ot.values[
       'VK_SWAPCHAIN_CREATE_PROTECTED_BIT_KHR'].comment == 'Swapchain is protected'
 
@@ -170,17 +188,17 @@ def TestParser(registry_file):
   assert r.constants['VK_REMAINING_MIP_LEVELS'].value == '(~0U)'
 
   # Base type alias check
-  b32 = r.types['VkBool32']
+  b32 = types['VkBool32']
   assert isinstance(b32, TypeAlias)
-  assert b32.alias == r.types['uint32_t']
+  assert b32.alias == types['uint32_t']
 
   # Test for TypeRef resolution
-  si = r.types['VkSubmitInfo']
+  si = types['VkSubmitInfo']
   assert si.members[4].name == 'pWaitDstStageMask'
   assert isinstance(si.members[4].type, DynamicArray)
   assert isinstance(si.members[4].type.base_type, Bitmask)
 
-  up = r.commands['vkUpdateDescriptorSets']
+  up = commands['vkUpdateDescriptorSets']
   dw = up.parameters[2]
   assert isinstance(dw, Field)
   assert dw.type.name == 'ConstDynamicArray(VkWriteDescriptorSet)'
@@ -189,17 +207,16 @@ def TestParser(registry_file):
   assert isinstance(wds.members[1].type, NextPtr)
 
   # Test struct extends
-  ici = r.types['VkInstanceCreateInfo']
+  ici = types['VkInstanceCreateInfo']
   assert len(ici.structextends) == 0
   for se in ici.extendedby:
     assert ici in se.structextends
 
   # Check enum value from included extension
-  st = r.types['VkStructureType']
   assert 'VK_STRUCTURE_TYPE_SWAPCHAIN_CREATE_INFO_KHR' in st.values
 
   # Check filtering by author.
-  r1 = Registry(registry_file, authors=[''])
+  r1 = LoadRegistry(registry_file, authors=[''])
   assert 'VkMemoryRequirements2' in r1.types
   assert 'VkMemoryRequirements2KHR' not in r1.types
 
@@ -218,36 +235,37 @@ def TestParser(registry_file):
   st = r1.types['VkStructureType']
   assert 'VK_STRUCTURE_TYPE_SWAPCHAIN_CREATE_INFO_KHR' not in st.values
 
-  r2 = Registry(registry_file,
-                authors=['', 'KHR'],
-                allowed_extensions=['VK_EXT_private_data'])
+  r2 = LoadRegistry(registry_file,
+                    authors=['', 'KHR'],
+                    allowed_extensions=['VK_EXT_private_data'])
   assert 'VkPrivateDataSlotEXT' in r2.types
-  assert 'VkPrivateDataSlotEXT' not in r.types
+  assert 'VkPrivateDataSlotEXT' not in types
   assert 'vkCreatePrivateDataSlotEXT' in r2.commands
-  assert 'vkCreatePrivateDataSlotEXt' not in r.commands
+  assert 'vkCreatePrivateDataSlotEXt' not in commands
 
-  r3 = Registry(registry_file,
-                authors=['', 'KHR'],
-                blocked_extensions=['VK_KHR_display'])
+  r3 = LoadRegistry(registry_file,
+                    authors=['', 'KHR'],
+                    blocked_extensions=['VK_KHR_display'])
   assert 'VkDisplayKHR' not in r3.types
-  assert 'VkDisplayKHR' in r.types
+  assert 'VkDisplayKHR' in types
   assert 'vkCreateDisplayModeKHR' not in r3.commands
-  assert 'vkCreateDisplayModeKHR' in r.commands
+  assert 'vkCreateDisplayModeKHR' in commands
 
-  assert r.commands["vkCmdDrawIndexedIndirectCount"].feature == "VK_VERSION_1_2"
-  assert r.commands["vkCmdDraw"].feature == "VK_VERSION_1_0"
-  assert r.commands["vkGetSwapchainImagesKHR"].feature is None
+  assert commands["vkCmdDrawIndexedIndirectCount"].feature == "VK_VERSION_1_2"
+  assert commands["vkCmdDraw"].feature == "VK_VERSION_1_0"
+  assert commands["vkGetSwapchainImagesKHR"].feature is None
 
 
 def TestAliases(registry_file):
-  r = Registry(registry_file)
+  r = LoadRegistry(registry_file)
 
   # Check alias resolution works.
-  aliased_types = [at for at in r.types.values() if isinstance(at, TypeAlias)]
-  aliased_base_types = [
-      at for at in r.types.values()
-      if isinstance(at, TypeAlias) and at.is_base_type_alias
-  ]
+  aliased_types = r.type_aliases
+  aliased_base_types = r.base_type_aliases
+  assert all(isinstance(at, TypeAlias) for at in aliased_types.values())
+  assert all(at.is_base_type_alias for at in aliased_base_types.values())
+  assert 'VkMemoryRequirements2KHR' in aliased_types
+  assert 'VkBool32' in aliased_base_types
   non_aliased_types = resolve_aliases(r.types)
   assert len(aliased_types) - len(aliased_base_types) + len(
       non_aliased_types) == len(r.types)
@@ -270,18 +288,17 @@ def TestAliases(registry_file):
   assert isinstance(mr2khr, TypeAlias)
   assert mr2khr.alias == mr2
   assert len(mr2khr.extensions) == 2
-  assert 'VK_KHR_get_memory_requirements2' in [
-      ext.name for ext in mr2khr.extensions
-  ]
-  assert 'VK_NV_ray_tracing' in [ext.name for ext in mr2khr.extensions]
+  mr2khr_extensions = {ext.name for ext in mr2khr.extensions}
+  assert 'VK_KHR_get_memory_requirements2' in mr2khr_extensions
+  assert 'VK_NV_ray_tracing' in mr2khr_extensions
 
 
 def TestFiltering(registry_file):
   # Select only the GGP extensions, make sure they get filtered.
-  r = Registry(registry_file,
-               platforms=['ggp'],
-               authors=['', 'GGP'],
-               supported='vulkan')
+  r = LoadRegistry(registry_file,
+                   platforms=['ggp'],
+                   authors=['', 'GGP'],
+                   supported='vulkan')
 
   assert 'VK_GGP_stream_descriptor_surface' in r.extensions
   assert 'VK_GGP_frame_token' in r.extensions
@@ -293,10 +310,10 @@ def TestFiltering(registry_file):
 
 
 def TestEnumFiltering(registry_file):
-  r = Registry(registry_file,
-               platforms=['ggp'],
-               authors=['', 'GGP'],
-               supported='vulkan')
+  r = LoadRegistry(registry_file,
+                   platforms=['ggp'],
+                   authors=['', 'GGP'],
+                   supported='vulkan')
 
   # Check we filter out the enum values from VK_EXT_debug_report
   vkresult = r.types['VkResult']
@@ -304,7 +321,9 @@ def TestEnumFiltering(registry_file):
 
 
 def TestStructFiltering(registry_file):
-  r = Registry(registry_file, platforms=[''], authors=['', 'KHR', 'EXT', 'AMD'])
+  r = LoadRegistry(registry_file,
+                   platforms=[''],
+                   authors=['', 'KHR', 'EXT', 'AMD'])
 
   # Test that structs and their exteded refs get filtered
   assert 'VkPipelineRasterizationStateRasterizationOrderAMD' in r.types
@@ -314,7 +333,7 @@ def TestStructFiltering(registry_file):
       'VkPipelineRasterizationStateRasterizationOrderAMD'] in r.types[
           'VkPipelineRasterizationStateCreateInfo'].extendedby
 
-  r = Registry(registry_file)
+  r = LoadRegistry(registry_file)
 
   # Make sure the AMD type and it's extended reference get removed
   assert 'VkPipelineRasterizationStateRasterizationOrderAMD' not in r.types
@@ -325,7 +344,7 @@ def TestStructFiltering(registry_file):
 
 
 def TestPlatforms(registry_file):
-  r = Registry(registry_file)
+  r = LoadRegistry(registry_file)
   assert 'ggp' not in r.platforms
 
   # test the default/core platform
@@ -340,7 +359,7 @@ def TestPlatforms(registry_file):
   assert 'vkCreateStreamDescriptorSurfaceGGP' not in p.commands
 
   # test platform filtering
-  r = Registry(registry_file, platforms=['ggp'])
+  r = LoadRegistry(registry_file, platforms=['ggp'])
 
   ggp = r.platforms['ggp']
   assert ggp.macro == 'VK_USE_PLATFORM_GGP'
@@ -349,7 +368,7 @@ def TestPlatforms(registry_file):
   assert 'vkCreateStreamDescriptorSurfaceGGP' in ggp.commands
 
   # win32 platform checks
-  r = Registry(registry_file, platforms=['win32'])
+  r = LoadRegistry(registry_file, platforms=['win32'])
   assert 'vkCreateAndroidSurfaceKHR' not in r.commands
 
   win = r.platforms['win32']
@@ -358,7 +377,7 @@ def TestPlatforms(registry_file):
   assert sci.name == 'pCreateInfo'
 
   # core vs platform checks
-  r = Registry(registry_file, platforms=['', 'win32'])
+  r = LoadRegistry(registry_file, platforms=['', 'win32'])
   assert 'vkCreateWin32SurfaceKHR' not in r.platforms[''].commands
   assert 'vkCreateWin32SurfaceKHR' in r.platforms['win32'].commands
 
@@ -367,10 +386,10 @@ def TestPlatforms(registry_file):
   assert 'VK_FUCHSIA_imagepipe_surface' not in r.extensions
   assert 'VK_EXT_filter_cubic' not in r.extensions
   assert 'VK_INTEL_shader_integer_functions2' not in r.extensions
-  r = Registry(registry_file,
-               platforms=[vkapi.VULKAN_ALL_PLATFORMS],
-               authors=[vkapi.VULKAN_ALL_AUTHORS],
-               supported=[vkapi.VULKAN_ALL_SUPPORTED])
+  r = LoadRegistry(registry_file,
+                   platforms=[vkapi.VULKAN_ALL_PLATFORMS],
+                   authors=[vkapi.VULKAN_ALL_AUTHORS],
+                   supported=[vkapi.VULKAN_ALL_SUPPORTED])
   assert 'VK_FUCHSIA_imagepipe_surface' in r.extensions
   assert 'VK_EXT_filter_cubic' in r.extensions
   assert 'VK_INTEL_shader_integer_functions2' in r.extensions
@@ -381,7 +400,8 @@ def TestPlatforms(registry_file):
 
 def TestExtensions(registry_file):
   # test allowing all the extensions
-  r = Registry(registry_file, allowed_extensions=[vkapi.VULKAN_ALL_EXTENSIONS])
+  r = LoadRegistry(registry_file,
+                   allowed_extensions=[vkapi.VULKAN_ALL_EXTENSIONS])
   assert 'VK_EXT_debug_utils' in r.extensions
   assert 'VK_GGP_stream_descriptor_surface' in r.extensions
   assert 'VK_FUCHSIA_imagepipe_surface' in r.extensions
@@ -390,15 +410,16 @@ def TestExtensions(registry_file):
   assert 'VK_QCOM_extension_173' in r.extensions
 
   # test blocking all the extensions
-  r = Registry(registry_file, blocked_extensions=[vkapi.VULKAN_ALL_EXTENSIONS])
+  r = LoadRegistry(registry_file,
+                   blocked_extensions=[vkapi.VULKAN_ALL_EXTENSIONS])
   assert len(r.extensions) == 0
 
 
 def TestLengthExpr(registry_file):
-  r = Registry(registry_file,
-               platforms=['', 'android', 'ggp'],
-               authors=['', 'KHR', 'EXT', 'GGP'],
-               allowed_extensions=['VK_KHR_acceleration_structure'])
+  r = LoadRegistry(registry_file,
+                   platforms=['', 'android', 'ggp'],
+                   authors=['', 'KHR', 'EXT', 'GGP'],
+                   allowed_extensions=['VK_KHR_acceleration_structure'])
   c = r.commands['vkAllocateDescriptorSets']
   p = c.find_parameter('pDescriptorSets')
   assert 'pAllocateInfo->descriptorSetCount' == p.type.length_expr()
@@ -421,14 +442,24 @@ def TestLengthExpr(registry_file):
 
 
 def TestXmlNodes(registry_file):
-  r = Registry(registry_file, platforms=['', 'ggp'])
+  r = LoadRegistry(registry_file, platforms=['', 'ggp'])
+
+  # Checks that the objects have an xml node, except for those selected by
+  # `no_node` which must have none. All failing objects are reported at once.
+  def check_xml_nodes(objs, no_node=lambda obj: False):
+    bad = []
+    for obj in objs:
+      if no_node(obj):
+        ok = obj.xml_node is None
+      else:
+        ok = isinstance(obj.xml_node, ET.Element)
+      if not ok:
+        bad.append(obj)
+    assert not bad, [str(obj) for obj in bad]
 
   # Every type must have an xml node unless it's a string or a type alias
-  for t in r.types.values():
-    if t.name == 'string' or isinstance(t, TypeAlias):
-      assert t.xml_node is None, t
-    else:
-      assert isinstance(t.xml_node, ET.Element), t
+  check_xml_nodes(r.types.values(),
+                  lambda t: t.name == 'string' or isinstance(t, TypeAlias))
 
   def check_obj_attr(obj, expected_class, attr_name, expected_attr):
     assert isinstance(obj, expected_class)
@@ -456,47 +487,36 @@ def TestXmlNodes(registry_file):
   check_obj_attr(field, Field, 'optional', 'true')
 
   # Type modifiers must have no xml node
-  ptr = r.types['VkBaseInStructure'].find_member('pNext').type
+  ptr = field.type
   assert isinstance(ptr, TypeModifier)
   assert ptr.xml_node == None
 
   # Every command must have an xml node
-  for c in r.commands.values():
-    assert isinstance(c.xml_node, ET.Element), c
+  check_xml_nodes(r.commands.values())
 
-  assert Counter(r.commands['vkCreateInstance'].successcodes) == Counter(
-      ['VK_SUCCESS'])
-  assert Counter(
-      r.commands['vkEnumerateDeviceLayerProperties'].errorcodes) == Counter(
-          ['VK_ERROR_OUT_OF_HOST_MEMORY', 'VK_ERROR_OUT_OF_DEVICE_MEMORY'])
+  assert set(r.commands['vkCreateInstance'].successcodes) == {'VK_SUCCESS'}
+  assert set(r.commands['vkEnumerateDeviceLayerProperties'].errorcodes) == {
+      'VK_ERROR_OUT_OF_HOST_MEMORY', 'VK_ERROR_OUT_OF_DEVICE_MEMORY'
+  }
 
   # Every constant must have an xml node unless it's a type alias
-  for c in r.constants.values():
-    if isinstance(c, TypeAlias):
-      assert c.xml_node is None, c
-    else:
-      assert isinstance(c.xml_node, ET.Element), c
+  check_xml_nodes(r.constants.values(), lambda c: isinstance(c, TypeAlias))
 
   check_obj_attr(r.constants['VK_UUID_SIZE'], EnumValue, 'value', '16')
 
   # Every extension must have an xml node
-  for e in r.extensions.values():
-    assert isinstance(e.xml_node, ET.Element), e
+  check_xml_nodes(r.extensions.values())
 
   check_obj_attr(r.extensions['VK_KHR_surface'], Extension, 'author', 'KHR')
 
   # Every platform must have an xml node unless it's a default platform
-  for p in r.platforms.values():
-    if p.name == '':
-      assert p.xml_node is None
-    else:
-      assert isinstance(p.xml_node, ET.Element), p
+  check_xml_nodes(r.platforms.values(), lambda p: p.name == '')
 
   check_obj_attr(r.platforms['ggp'], Platform, 'protect', 'VK_USE_PLATFORM_GGP')
 
 
 def TestExtensionEnums(registry_file):
-  r = Registry(registry_file)
+  r = LoadRegistry(registry_file)
   p = r.platforms['']
   extname = 'VK_KHR_get_physical_device_properties2'
   assert extname in p.extensions
@@ -506,13 +526,31 @@ def TestExtensionEnums(registry_file):
       extname].spec_version_enum == 'VK_KHR_GET_PHYSICAL_DEVICE_PROPERTIES_2_SPEC_VERSION'
 
 
-registry_file = sys.argv[1] if len(sys.argv) > 1 else 'vk.xml'
-TestParser(registry_file)
-TestAliases(registry_file)
-TestFiltering(registry_file)
-TestEnumFiltering(registry_file)
-TestStructFiltering(registry_file)
-TestPlatforms(registry_file)
-TestLengthExpr(registry_file)
-TestXmlNodes(registry_file)
-TestExtensionEnums(registry_file)
+# The tests are independent, so they run in parallel processes.
+# Each process parses the registries its tests need.
+# Runs `tests` in order. Used to run tests that share registries in the same
+# process.
+def RunTests(tests, registry_file):
+  for test in tests:
+    test(registry_file)
+
+
+if __name__ == '__main__':
+  registry_file = sys.argv[1] if len(sys.argv) > 1 else 'vk.xml'
+  # Tests loading the same registry configurations are grouped, so each
+  # configuration is parsed once by the process running the group.
+  test_groups = [
+      [TestParser],
+      [TestAliases, TestStructFiltering, TestPlatforms, TestExtensionEnums],
+      [TestFiltering, TestEnumFiltering],
+      [TestLengthExpr],
+      [TestXmlNodes],
+  ]
+  with ProcessPoolExecutor(min(len(test_groups),
+                               os.cpu_count() or 1)) as executor:
+    futures = [
+        executor.submit(RunTests, tests, registry_file) for tests in test_groups
+    ]
+    # Re-raises the first failure, in test order.
+    for future in futures:
+      future.result()
@@ -15,10 +15,24 @@
 from .vkapi import *
 from typing import Dict, List, Optional, Callable, Tuple, Union
 import dataclasses
+import functools
+import re
+import sys
 from dataclasses import dataclass
 
+# An instance of these is created for every handle and create/destroy
+# command; use slots where dataclasses support them (Python 3.10+).
+if sys.version_info >= (3, 10):
+  _record = functools.partial(dataclass, slots=True)
+else:
+  _record = dataclass
 
-@dataclass
+# Matches the names of commands that create or destroy handles, the group is
+# the kind of command.
+_HANDLE_COMMAND_RE = re.compile(r'vk(Create|Allocate|Destroy|Free)')
+
+
+@_record
 class HandleCreateCommand:
   """Information about a handle-creation command
 
@@ -51,7 +65,7 @@ class HandleCreateCommand:
   is_get: bool = False
 
 
-@dataclass
+@_record
 class HandleDestroyCommand:
   """Information about a handle-destruction command
 
@@ -70,7 +84,7 @@ class HandleDestroyCommand:
   handle_param: Optional[Field]
 
 
-@dataclass
+@_record
 class HandleInfo:
   """Information about the commands that create/destroy a handle type
 
@@ -101,33 +115,75 @@ class HandleInfo:
   object_type: Optional[EnumValue] = None
 
 
+@_record
+class CommandInfo:
+  """What a command does to handles, resolved once for templates
+
+  Args:
+    kind: one of 'create', 'pool_allocate', 'get', 'destroy' or 'reset_pool'
+    handle_info: info about the handle type created, destroyed or reset by
+      the command
+    create_cmd: the HandleCreateCommand for 'create', 'pool_allocate' and
+      'get' commands, None otherwise
+  """
+  kind: str
+  handle_info: HandleInfo
+  create_cmd: Optional[HandleCreateCommand] = None
+
+
 class HandleInfoGlobals:
   """Functions for templates to access information about handles
 
+  Building the handle infos walks every command in the registry, so create
+  one HandleInfoGlobals per registry and attach its globals to a single,
+  long-lived environment rather than rebuilding either per template.
+
   Example Usage:
 
-    env = vkapi.JinjaEnvironment(registry)
+    env = vkapi.JinjaEnvironment(
+        registry,
+        bytecode_cache=jinja2.FileSystemBytecodeCache('/tmp/jinja'),
+        auto_reload=False)
     handle_infos = vkapi.HandleInfoGlobals(registry)
     env.globals.update(handle_infos.globals)
   """
 
+  # Methods made available to templates through `globals`.
+  _EXPORTED = (
+      'command_handle_created',
+      'command_handle_destroyed',
+      'command_info',
+      'command_pool_reset',
+      'handle_info',
+      'is_create_command',
+      'is_destroy_command',
+      'is_get_command',
+      'is_pool_allocate_command',
+      'is_reset_pool_command',
+  )
+
   def __init__(self, registry: Registry):
     self._registry = registry
+    self._globals = None
+    self._VkAllocationCallbacks = registry.types['VkAllocationCallbacks']
     self._build_handle_infos()
+    # Handle types are looked up far more often than names.
+    self._handle_infos_by_handle = {
+        info.handle: info for info in self._handle_infos.values()
+    }
+    self._build_command_maps()
 
   @property
   def globals(self) -> Dict[str, Callable]:
     """Returns a dict to add to the jinja Environment globals"""
-    return {
-        f: getattr(self, f)
-        for f in dir(self)
-        if not f.startswith('_') and f != 'globals'
-    }
+    if self._globals is None:
+      self._globals = {f: getattr(self, f) for f in self._EXPORTED}
+    return self._globals
 
   def handle_info(self, h: Union[str, Handle]) -> Optional[HandleInfo]:
     """Find HandleInfo for a given handle type"""
     if isinstance(h, Handle):
-      h = h.name
+      return self._handle_infos_by_handle.get(h)
     return self._handle_infos.get(h)
 
   def command_handle_created(
@@ -139,52 +195,28 @@ class HandleInfoGlobals:
       a handle-creation command, both handle_info and handle_create_command
       are None
     """
-    for p in cmd.parameters:
-      if not (isinstance(p.type, Pointer) or isinstance(p.type, DynamicArray)):
-        continue
-      if p.type.is_const:
-        continue
-      info = self.handle_info(p.type.base_type)
-      if info is None:
-        continue
-      for create_cmd in info.create_cmds:
-        if cmd is create_cmd.command and p is create_cmd.handle_param:
-          return info, create_cmd
-      continue
-    return None, None
+    return self._cmd_to_create.get(cmd, (None, None))
 
   def is_create_command(self, cmd: Command) -> bool:
     """Indicates whether the command is a handle-creation command
 
     E.g. vkCreateImage
     """
-    info, create_cmd = self.command_handle_created(cmd)
-    if create_cmd is not None:
-      return create_cmd.is_create
-    else:
-      return False
+    return cmd in self._create_commands
 
   def is_pool_allocate_command(self, cmd: Command) -> bool:
     """Indicates whether the command allocates handles in a pool
 
     E.g. vkAllocateDescriptorSets
     """
-    info, create_cmd = self.command_handle_created(cmd)
-    if create_cmd is not None:
-      return create_cmd.is_pool_allocate
-    else:
-      return False
+    return cmd in self._pool_allocate_commands
 
   def is_get_command(self, cmd: Command) -> bool:
     """Indicates whether the command gets existing handles
 
     E.g. vkGetDeviceQueue or vkEnumeratePhysicalDevices
     """
-    info, create_cmd = self.command_handle_created(cmd)
-    if create_cmd is not None:
-      return create_cmd.is_get
-    else:
-      return False
+    return cmd in self._get_commands
 
   def command_handle_destroyed(self, cmd: Command) -> Optional[HandleInfo]:
     """Find info about the handle type destroyed by a command
@@ -192,21 +224,11 @@ class HandleInfoGlobals:
     Returns: Info about the destroyed handle type, or None if the command is
       not a handle-destruction command.
     """
-    for p in cmd.parameters:
-      t = p.type
-      if isinstance(t, DynamicArray):
-        t = t.base_type
-      if not isinstance(t, Handle):
-        continue
-      info = self.handle_info(t)
-      if info is None:
-        continue
-      if info.destroy_cmd is not None and cmd is info.destroy_cmd.command:
-        return info
+    return self._cmd_to_destroy.get(cmd)
 
   def is_destroy_command(self, cmd: Command) -> bool:
     """Indicates whether the command is a handle-destruction command"""
-    return self.command_handle_destroyed(cmd) is not None
+    return cmd in self._cmd_to_destroy
 
   def command_pool_reset(
       self, cmd: Command) -> Tuple[Optional[HandleInfo], Optional[HandleInfo]]:
@@ -217,28 +239,47 @@ class HandleInfoGlobals:
 
       E.g., for command_pool_reset(vkResetDescriptorPool) returns VkDescriptorSet
     """
-    for p in cmd.parameters:
-      pool_info = self.handle_info(p.type)
-      if pool_info is None or pool_info.pool_elem is None:
-        continue
-      elem_info = self.handle_info(pool_info.pool_elem)
-      if elem_info.reset_pool_cmd is not None and cmd is elem_info.reset_pool_cmd.command:
-        return pool_info, elem_info
-    return None, None
+    return self._cmd_to_pool_reset.get(cmd, (None, None))
 
   def is_reset_pool_command(self, cmd: Command) -> bool:
     """Indicates whether the command is a pool-reset command"""
-    pool_info, elem_info = self.command_pool_reset(cmd)
-    return elem_info is not None
+    return cmd in self._cmd_to_pool_reset
+
+  def command_info(self, cmd: Command) -> Optional[CommandInfo]:
+    """Find what a command does to handles with a single call
+
+    Returns: A CommandInfo whose `kind` names the matching is_*_command
+      predicate, or None if the command does not create, get, destroy or
+      reset handles.
+    """
+    return self._command_infos.get(cmd)
 
   def _build_handle_infos(self) -> None:
     registry = self._registry
     self._handle_infos = {}
+    self._cmd_to_create = {}
+    # First HandleInfo created for each pool handle name.
+    self._pool_elem_infos = {}
+
+    # Sort the commands by what they do to handles in a single pass.
+    create_names = []
+    destroy_names = []
+    free_names = []
+    names_by_kind = {
+        'Create': create_names,
+        'Allocate': create_names,
+        'Destroy': destroy_names,
+        'Free': free_names,
+    }
     for name, cmd in registry.commands.items():
       if cmd.name != name:
         continue  # alias
-      if name.startswith('vkCreate') or name.startswith('vkAllocate'):
-        self._add_handle_create_command(name)
+      m = _HANDLE_COMMAND_RE.match(name)
+      if m is not None:
+        names_by_kind[m[1]].append(name)
+
+    for name in create_names:
+      self._add_handle_create_command(name)
     self._add_handle_create_command('vkEnumeratePhysicalDevices')
     self._add_handle_create_command('vkGetDeviceQueue')
     self._add_handle_create_command('vkGetDeviceQueue2')
@@ -256,65 +297,102 @@ class HandleInfoGlobals:
           )
           self._handle_infos[name] = info
 
-    for name, cmd in registry.commands.items():
-      if cmd.name != name:
-        continue  # alias
-      if name.startswith('vkDestroy'):
-        self._add_handle_destroy_command(name)
-      elif name.startswith('vkFree'):
-        self._add_handle_free_command(name)
+    for name in destroy_names:
+      self._add_handle_destroy_command(name)
+    for name in free_names:
+      self._add_handle_free_command(name)
 
     self._add_handle_reset_command('vkResetDescriptorPool')
 
+    # VkObjectType values spell the handle name in upper case with '_'
+    # between words (VkDescriptorSet is VK_OBJECT_TYPE_DESCRIPTOR_SET), so
+    # both sides are compared upper case without the prefix and the '_'s.
+    infos_by_object_type_name = {
+        name[len('Vk'):].upper(): info
+        for (name, info) in self._handle_infos.items()
+    }
     VkObjectType = registry.types['VkObjectType']
     for v in VkObjectType.values.values():
       if isinstance(v, TypeAlias):
         continue
       if v.name == 'VK_OBJECT_TYPE_UNKNOWN':
         continue
-      handle_name = v.comment
-      if handle_name not in self._handle_infos:
-        words = v.name[len("VK_OBJECT_TYPE_"):].split('_')
-        words = [w.capitalize() for w in words]
-        if words[-1].upper() in {'EXT', 'KHR'}:
-          words[-1] = words[-1].upper()
-        handle_name = "Vk" + ''.join(words)
-      self._handle_infos[handle_name].object_type = v
+      info = self._handle_infos.get(v.comment)
+      if info is None:
+        info = infos_by_object_type_name[
+            v.name[len('VK_OBJECT_TYPE_'):].replace('_', '')]
+      info.object_type = v
 
     for info in self._handle_infos.values():
       if info.object_type is None:
         print(f'ERROR: No VkObjectType found for {info.handle.name}')
         assert (info.object_type is not None)
-
-    for info in self._handle_infos.values():
       if info.pool:
         self._handle_infos[info.pool.name].pool_elem = info.handle
 
+  def _build_command_maps(self) -> None:
+    # Map each destroy and pool reset command to the handle infos it belongs
+    # to, so the command_* lookups don't scan the parameters. Create commands
+    # are mapped as they are added.
+    self._cmd_to_destroy = {}
+    self._cmd_to_pool_reset = {}
+    for info in self._handle_infos.values():
+      if info.destroy_cmd is not None:
+        self._cmd_to_destroy.setdefault(info.destroy_cmd.command, info)
+      if info.pool_elem is not None:
+        elem_info = self._handle_infos_by_handle[info.pool_elem]
+        if elem_info.reset_pool_cmd is not None:
+          self._cmd_to_pool_reset.setdefault(elem_info.reset_pool_cmd.command,
+                                             (info, elem_info))
+
+    # Commands for each kind of handle creation, for the is_* predicates.
+    create_cmds = [c for (_, c) in self._cmd_to_create.values()]
+    self._create_commands = frozenset(
+        c.command for c in create_cmds if c.is_create)
+    self._pool_allocate_commands = frozenset(
+        c.command for c in create_cmds if c.is_pool_allocate)
+    self._get_commands = frozenset(c.command for c in create_cmds if c.is_get)
+
+    self._command_infos = {}
+    for (cmd, (info, create_cmd)) in self._cmd_to_create.items():
+      if create_cmd.is_create:
+        kind = 'create'
+      elif create_cmd.is_pool_allocate:
+        kind = 'pool_allocate'
+      else:
+        kind = 'get'
+      self._command_infos[cmd] = CommandInfo(kind, info, create_cmd)
+    for (cmd, info) in self._cmd_to_destroy.items():
+      self._command_infos.setdefault(cmd, CommandInfo('destroy', info))
+    for (cmd, (_, elem_info)) in self._cmd_to_pool_reset.items():
+      self._command_infos.setdefault(cmd, CommandInfo('reset_pool', elem_info))
+
   def _add_handle_create_command(self, name: str) -> None:
     cmd = self._registry.commands[name]
     parent_param = None
     create_info_param = None
     handle_param = None
-    VkAllocationCallbacks = self._registry.types['VkAllocationCallbacks']
+    VkAllocationCallbacks = self._VkAllocationCallbacks
     for p in cmd.parameters:
-      is_pointer = isinstance(p.type, Pointer) or isinstance(
-          p.type, DynamicArray)
-      is_pointer_to_struct = is_pointer and isinstance(p.type.base_type, Struct)
-      is_pointer_to_handle = is_pointer and isinstance(p.type.base_type, Handle)
-      if isinstance(p.type, Handle):
+      # Classify each parameter once: a handle is a parent candidate, a
+      # pointer may point to the create info or to the created handle(s).
+      t = p.type
+      if isinstance(t, Handle):
         if parent_param is None:
           parent_param = p
-      if is_pointer_to_struct and p.type.is_const and p.type.base_type != VkAllocationCallbacks:
-        assert (create_info_param is None)
-        create_info_param = p
-      elif is_pointer_to_handle and not p.type.is_const:
-        assert (handle_param is None)
-        handle_param = p
+      elif isinstance(t, (Pointer, DynamicArray)):
+        base_type = t.base_type
+        if isinstance(base_type, Struct):
+          if t.is_const and base_type != VkAllocationCallbacks:
+            assert (create_info_param is None)
+            create_info_param = p
+        elif isinstance(base_type, Handle) and not t.is_const:
+          assert (handle_param is None)
+          handle_param = p
     if handle_param is None:
       print(f'Warning: no handle parameter found for {cmd.name}. Skipping.')
       return
     assert (parent_param is not None or name == 'vkCreateInstance')
-    assert (handle_param is not None)
     parent = parent_param.type if parent_param is not None else None
     create_info = create_info_param.type.base_type if create_info_param is not None else None
     pool_member = None
@@ -359,6 +437,9 @@ class HandleInfoGlobals:
           create_cmds=[create_cmd],
       )
       self._handle_infos[handle.name] = info
+      if pool is not None:
+        self._pool_elem_infos.setdefault(pool.name, info)
+    self._cmd_to_create.setdefault(cmd, (info, create_cmd))
 
   def _add_handle_destroy_command(self, name: str) -> None:
     cmd = self._registry.commands[name]
@@ -436,14 +517,9 @@ class HandleInfoGlobals:
     if not isinstance(pool, Handle):
       return
 
-    handle = None
-    for info in self._handle_infos.values():
-      if info.pool is not None and info.pool.name == pool.name:
-        handle = info.handle
-        break
-    if handle is None:
+    info = self._pool_elem_infos.get(pool.name)
+    if info is None:
       return
-    assert (info.pool.name == pool.name)
 
     assert (info.reset_pool_cmd is None)
     info.reset_pool_cmd = HandleDestroyCommand(
@@ -16,9 +16,8 @@
 # This Registry can be used to query the Vulkan API to generate code or other uses.
 
 import xml.etree.ElementTree as ET
-import copy
-import jinja2
 import re
+import sys
 from dataclasses import dataclass
 from typing import Optional
 
@@ -28,12 +27,36 @@ VULKAN_ALL_AUTHORS = 'VULKAN_ALL_AUTHORS'
 VULKAN_ALL_SUPPORTED = 'VULKAN_ALL_SUPPORTED'
 VULKAN_ALL_EXTENSIONS = 'VULKAN_ALL_EXTENSIONS'
 
+# Top level sections of vk.xml that the registry is built from. Everything
+# else (formats, spirv*, comments, ...) is dropped right after parsing.
+_REGISTRY_SECTIONS = frozenset([
+    'platforms', 'tags', 'types', 'enums', 'commands', 'feature', 'extensions'
+])
+
+# Tokens of a member or parameter declaration, around its type and name.
+# The surrounding whitespace is part of the match so the declaration can be
+# scanned without slicing it.
+_TYPE_TOKEN_RE = re.compile(r'\s*(\bstruct\b|\bconst\b|\*|\[|:)\s*')
+# The size of a fixed array, up to the closing ']'.
+_FIXED_ARRAY_LENGTH_RE = re.compile(r'[^\]]+')
+# The width of a bit field.
+_BIT_SIZE_RE = re.compile(r'[0-9]+')
+# The part of a dynamic array length that names a field, e.g. "pImageCount"
+# or "pAllocateInfo->descriptorSetCount".
+_LENGTH_FIELD_RE = re.compile(r'\b[a-zA-Z](\w|->)+')
+
 
 # Base Type class.
 class Type:
 
+  # Types are created for every element of the registry, slots keep them
+  # small and make attribute access cheaper.
+  __slots__ = ('_name', 'extensions', 'xml_node')
+
+  # Names are interned as they are used as keys and compared throughout the
+  # registry and by the generators.
   def __init__(self, name, xml_node):
-    self._name = name
+    self._name = sys.intern(name) if name is not None else None
     self.extensions = []
     self.xml_node = xml_node
 
@@ -51,38 +74,50 @@ class Type:
 # Mostly intended for internal parser usage.
 class TypeRef(Type):
 
+  __slots__ = ('ref',)
+
   def __init__(self, name):
     super().__init__(name, None)
-    self.ref = name
+    self.ref = self.name
 
 
 # TypeAlias class.
 # Use for types that are promoted and now alias
 class TypeAlias(Type):
 
+  __slots__ = ('alias', '_resolved')
+
   def __init__(self, name, alias):
     super().__init__(name, None)
     self.alias = alias
+    self._resolved = None
 
   # Returns the aliased type, recurses as needed.
+  # The chain is walked once; `alias` is left pointing at the direct alias.
+  # Until parsing resolves them, aliases may still be names or TypeRefs, so
+  # those results are not remembered.
   def resolve_type(self):
+    if self._resolved is not None:
+      return self._resolved
     ta = self
     while isinstance(ta, TypeAlias):
       ta = ta.alias
+      assert (ta is not self)
+    if isinstance(ta, Type) and not isinstance(ta, TypeRef):
+      self._resolved = ta
     return ta
 
   @property
   def is_base_type_alias(self):
-    alias = self.alias
-    while isinstance(alias, TypeAlias):
-      alias = alias.alias
-    return isinstance(alias, BaseType)
+    return isinstance(self.resolve_type(), BaseType)
 
 
 # BaseType types are pre-defined Vulkan types (VkBool32, VkResult, etc.)
 # Base C/C++ types such as unit32_t, float, etc. belong here.
 class BaseType(Type):
 
+  __slots__ = ()
+
   def __init__(self, name, xml_node):
     super().__init__(name, xml_node)
 
@@ -90,6 +125,8 @@ class BaseType(Type):
 # FunctionPtr represent function pointers.
 class FunctionPtr(Type):
 
+  __slots__ = ('parameters',)
+
   def __init__(self, registry, te):
     super().__init__(te.find('name').text, te)
     # TODO parse the parameters for types and names.
@@ -100,31 +137,42 @@ class FunctionPtr(Type):
 # Handle
 # Represents any Vulkan Handle.
 class Handle(Type):
+
+  __slots__ = ('is_dispatchable', 'parent', '_is_instance_handle')
+
   # Initialize from a type element node.
   def __init__(self, registry, te):
     super().__init__(te.find('name').text, te)
     self.is_dispatchable = te.find('type').text == 'VK_DEFINE_HANDLE'
     self.parent = TypeRef(te.get('parent', ''))
+    self._is_instance_handle = None
 
   @property
   def is_device_handle(self):
     return not self.is_instance_handle
 
+  # The parent chain doesn't change once the parents are resolved, so the
+  # walk is done on first use and remembered.
   @property
   def is_instance_handle(self):
-    if self.name == 'VkDevice':
-      return False
-    elif self.name == 'VkInstance':
-      return True
-    elif self.name == 'VkSwapchainKHR':
-      return False
-    return self.parent.is_instance_handle
+    if self._is_instance_handle is None:
+      if self.name == 'VkDevice':
+        self._is_instance_handle = False
+      elif self.name == 'VkInstance':
+        self._is_instance_handle = True
+      elif self.name == 'VkSwapchainKHR':
+        self._is_instance_handle = False
+      else:
+        self._is_instance_handle = self.parent.is_instance_handle
+    return self._is_instance_handle
 
 
 # EnumValue
 # Represents an enum value.
 class EnumValue(Type):
 
+  __slots__ = ('value', 'comment')
+
   def __init__(self, name, value, xml_node):
     super().__init__(name, xml_node)
     self.value = value
@@ -137,6 +185,9 @@ class EnumValue(Type):
 # Enum
 # Represents a Vulkan/C enum type.
 class Enum(Type):
+
+  __slots__ = ('values', 'is_bitmask', 'bitwidth')
+
   # Initialize from a type element node.
   # Optionally specify the name directly (for Enums without enum elements)
   # <enums name="VkImageLayout" type="enum">
@@ -160,7 +211,7 @@ class Enum(Type):
     # Enum value elements look like this:
     # <enum value="0"   name="VK_IMAGE_LAYOUT_UNDEFINED"  comment="blah"/>
     for ee in te.findall('enum'):
-      en = ee.get('name')
+      en = sys.intern(ee.get('name'))
       if ee.get('alias') is not None:
         self.values[en] = TypeAlias(en, ee.get('alias'))
         continue
@@ -169,17 +220,12 @@ class Enum(Type):
           self.is_bitmask = True
           str_v = ee.get('bitpos')
           ev = str_v
-          if str_v.startswith("0x"):
-            ev = 1 << int(str_v, base=16)
-          else:
-            ev = 1 << int(str_v, base=10)
+          # Base 0 would reject decimal values with leading zeros.
+          ev = 1 << int(str_v, 16 if str_v.startswith('0x') else 10)
         else:
           str_v = ee.get('value')
           ev = str_v
-          if str_v.startswith("0x"):
-            ev = int(str_v, base=16)
-          else:
-            ev = int(str_v, base=10)
+          ev = int(str_v, 16 if str_v.startswith('0x') else 10)
       except ValueError:
         pass
       self.values[en] = EnumValue(en, ev, ee)
@@ -187,15 +233,13 @@ class Enum(Type):
         self.values[en].comment = ee.get('comment')
 
   # Returns a {name:int} dictionary of all enum values, resolving aliases.
+  # Not cached: extensions add values while the registry is parsed and
+  # filtering replaces them, callers that need it often memoize the result.
   def get_integer_values(self):
-    iv = {}
-    for v in self.values.values():
-      if isinstance(v, EnumValue):
-        iv[v.name] = v.value
-      else:
-        iv[v.name] = v.resolve_type().value
-
-    return iv
+    return {
+        v.name: (v if isinstance(v, EnumValue) else v.resolve_type()).value
+        for v in self.values.values()
+    }
 
   def unique_values(self):
     return resolve_aliases(self.values)
@@ -205,6 +249,8 @@ class Enum(Type):
 # Represents a Vulkan bitmask type, points to the enum of flag values.
 class Bitmask(Type):
 
+  __slots__ = ('type', 'flags')
+
   def __init__(self, registry, te):
     super().__init__(te.find('name').text, te)
     self.type = te.find('type').text
@@ -220,8 +266,11 @@ class Bitmask(Type):
 # A Struct member or Command parameter
 class Field:
 
+  __slots__ = ('name', 'type', 'is_optional', 'is_output', 'bit_size', 'values',
+               'xml_node')
+
   def __init__(self, name, type, xml_node):
-    self.name = name
+    self.name = sys.intern(name)
     self.type = type
     self.is_optional = False
     self.is_output = False
@@ -237,6 +286,8 @@ class Field:
 # A modified type (pointer, array, etc)
 class TypeModifier(Type):
 
+  __slots__ = ('base_type', 'is_const')
+
   def __init__(self, t):
     super().__init__(t.name, None)
     self.base_type = t
@@ -251,6 +302,8 @@ class TypeModifier(Type):
 # NextPtr
 class NextPtr(TypeModifier):
 
+  __slots__ = ()
+
   def __init__(self, t):
     super().__init__(t)
 
@@ -258,6 +311,8 @@ class NextPtr(TypeModifier):
 # Pointer
 class Pointer(TypeModifier):
 
+  __slots__ = ()
+
   def __init__(self, t):
     super().__init__(t)
 
@@ -265,10 +320,15 @@ class Pointer(TypeModifier):
 # DynamicArray length is usually a parameter.
 class DynamicArray(TypeModifier):
 
+  __slots__ = ('length', 'parent', '_length_exprs', '_length_field')
+
   def __init__(self, t, length, parent):
     super().__init__(t)
     self.length = length
     self.parent = parent
+    # length_expr results, keyed by `obj_expr`.
+    self._length_exprs = {}
+    self._length_field = None
 
   # Returns a C++ expression for the length
   # For dynamic arrays that are fields of structs, `obj_expr` should be an
@@ -277,11 +337,38 @@ class DynamicArray(TypeModifier):
   # None (if the parameters are in-scope in the generated code), or could be an
   # expression for a struct storing the parameters.
   def length_expr(self, obj_expr: Optional[str] = None) -> str:
+    expr = self._length_exprs.get(obj_expr)
+    if expr is None:
+      expr = self._length_exprs[obj_expr] = self.__length_expr(obj_expr)
+    return expr
+
+  def __length_expr(self, obj_expr: Optional[str]) -> str:
+    # The length field doesn't depend on `obj_expr`, so it is found once.
+    if self._length_field is None:
+      self._length_field = self.__find_length_field()
+    if not self._length_field:
+      return self.length
+    (length_field_name, is_pointer) = self._length_field
+
+    # prepend the object expression
+    length_field_expr = length_field_name
+    if obj_expr is not None:
+      length_field_expr = obj_expr + "." + length_field_expr
+
+    # dereference length pointer
+    if is_pointer:
+      length_field_expr = "*" + length_field_expr
+
+    return self.length.replace(length_field_name, length_field_expr)
+
+  # Returns (length_field_name, is_pointer) for the field `length` refers to,
+  # or () if `length` doesn't refer to a field.
+  def __find_length_field(self):
     # find the part of the `length` string that looks like a field
     # e.g. "pImageCount" or "pAllocateInfo->descriptorSetCount"
-    match = re.search(r'\b[a-zA-Z](\w|->)+', self.length)
+    match = _LENGTH_FIELD_RE.search(self.length)
     if match is None:
-      return self.length
+      return ()
     length_field_name = match[0]
     length_field_parts = length_field_name.split('->')
 
@@ -306,23 +393,16 @@ class DynamicArray(TypeModifier):
     if length_field is None:
       # In some cases, the length is actually a constant instead of a field
       # name; in that case, just return the original length string
-      return self.length
-
-    # prepend the object expression
-    length_field_expr = length_field_name
-    if obj_expr is not None:
-      length_field_expr = obj_expr + "." + length_field_expr
+      return ()
 
-    # dereference length pointer
-    if isinstance(length_field.type, Pointer):
-      length_field_expr = "*" + length_field_expr
-
-    return self.length.replace(length_field_name, length_field_expr)
+    return (length_field_name, isinstance(length_field.type, Pointer))
 
 
 # FixedArray is fixed length array
 class FixedArray(TypeModifier):
 
+  __slots__ = ('length',)
+
   def __init__(self, t, length):
     super().__init__(t)
     self.length = length
@@ -331,6 +411,8 @@ class FixedArray(TypeModifier):
 # Platform describes a Vulkan platform: name, #ifdef, types and commands
 class Platform:
 
+  __slots__ = ('xml_node', 'name', 'macro', 'extensions', 'commands', 'types')
+
   def __init__(self, registry, pe):
     self.xml_node = pe
     if pe is not None:
@@ -343,22 +425,11 @@ class Platform:
       self.name = ''
       self.macro = ''
 
-      # This selects types and commands from non-platform specific extensions.
-      self.select_types_and_commands(registry)
-
-      # Finally we add types and commands without an extension (core)
-      core_commands = {
-          k: v for (k, v) in registry.commands.items() if len(v.extensions) == 0
-      }
-
-      core_types = {
-          k: v for (k, v) in registry.types.items() if len(v.extensions) == 0
-      }
+      # This selects types and commands from non-platform specific extensions,
+      # followed by the types and commands without an extension (core).
+      self.select_types_and_commands(registry, include_core=True)
 
-      self.commands = self.commands | core_commands
-      self.types = self.types | core_types
-
-  def select_types_and_commands(self, registry):
+  def select_types_and_commands(self, registry, include_core=False):
     self.extensions = {
         k: v
         for (k, v) in registry.extensions.items()
@@ -366,16 +437,25 @@ class Platform:
     }
 
     exts = set(self.extensions.values())
-    self.commands = {
-        k: v
-        for (k, v) in registry.commands.items()
-        if len(exts.intersection(v.extensions)) > 0
-    }
-    self.types = {
-        k: v
-        for (k, v) in registry.types.items()
-        if len(exts.intersection(v.extensions)) > 0
-    }
+    self.commands = self.__select(registry.commands, exts, include_core)
+    self.types = self.__select(registry.types, exts, include_core)
+
+  # Returns the items from one of the platform extensions in `exts`, then the
+  # core items if `include_core` is set, in a single pass over `items`.
+  @staticmethod
+  def __select(items, exts, include_core):
+    selected = {}
+    core = {}
+    for (k, v) in items.items():
+      if len(v.extensions) == 0:
+        if include_core:
+          core[k] = v
+      # isdisjoint stops at the first shared extension and, unlike
+      # intersection, doesn't build a set per type and command.
+      elif not exts.isdisjoint(v.extensions):
+        selected[k] = v
+    selected.update(core)
+    return selected
 
 
 # Handles enum value extensions from either ex
@@ -419,7 +499,6 @@ class _PointerLevel:
 
 
 def _parse_type_modifiers(me):
-  type_regex = re.compile(r'\bstruct\b|\bconst\b|\*|\[|:')
   type_str = me.text or ''
   for e in me:
     if e.text is not None and e.tag != 'type' and e.tag != 'name' and e.tag != 'comment':
@@ -430,11 +509,12 @@ def _parse_type_modifiers(me):
   is_const = False
   pointer_levels = []
   bits = None
-  while len(type_str) > 0:
-    m = type_regex.match(type_str)
-    tok = m.group(0)
+  pos = 0
+  while pos < len(type_str):
+    m = _TYPE_TOKEN_RE.match(type_str, pos)
     assert (m is not None)
-    type_str = type_str[len(tok):].strip()
+    tok = m.group(1)
+    pos = m.end()
     if tok == 'struct':
       continue
     elif tok == 'const':
@@ -443,15 +523,16 @@ def _parse_type_modifiers(me):
       pointer_levels.append(_PointerLevel(is_const=is_const))
       is_const = False
     elif tok == '[':
-      length = re.match(r'[^\]]+', type_str)[0]
-      type_str = type_str[len(length) + 1:].strip()
+      m = _FIXED_ARRAY_LENGTH_RE.match(type_str, pos)
+      length = m[0]
+      # Skip the closing ']'.
+      pos = m.end() + 1
       pointer_levels.append(
           _PointerLevel(is_const=is_const, is_fixed_array=True, length=length))
-      pass
     elif tok == ':':
-      bits = re.match(r'[0-9]+', type_str)[0]
-      type_str = type_str[len(bits):].strip()
-      bits = int(bits)
+      m = _BIT_SIZE_RE.match(type_str, pos)
+      bits = int(m[0])
+      pos = m.end()
 
   len_str = me.get('altlen')
   if len_str is None:
@@ -482,7 +563,11 @@ def parse_parameter_or_member(registry, me, parent):
   if base_type_name in registry.aliases:
     base_type_name = registry.aliases[base_type_name].name
 
-  base_type = TypeRef(base_type_name)
+  # TypeRefs are only placeholders until the registry resolves them, so
+  # fields with the same base type share one.
+  base_type = registry._type_refs.get(base_type_name)
+  if base_type is None:
+    base_type = registry._type_refs[base_type_name] = TypeRef(base_type_name)
 
   pointer_levels, bits = _parse_type_modifiers(me)
 
@@ -513,7 +598,9 @@ def parse_parameter_or_member(registry, me, parent):
   f = Field(name, t, me)
 
   # Some struct members have allowed values.
-  f.values = [x for x in me.get("values", "").split(',') if x]
+  # These are enum value names (mostly VK_STRUCTURE_TYPE_*), interned like
+  # the names they refer to.
+  f.values = [sys.intern(x) for x in me.get("values", "").split(',') if x]
 
   # Structs and parameters are both allowed to be optional (0 or null)
   f.is_optional = me.get('optional', '') == 'true'
@@ -531,6 +618,10 @@ def parse_parameter_or_member(registry, me, parent):
 # Struct
 # Structs represet a 'struct' type from the Vulkan spec.
 class Struct(Type):
+
+  __slots__ = ('is_union', 'members', 'extendedby', 'structextends',
+               '_members_by_name')
+
   # Given a type element create the appropriate struct type.
   def __init__(self, registry, te):
     super().__init__(te.attrib['name'], te)
@@ -539,6 +630,8 @@ class Struct(Type):
         parse_parameter_or_member(registry, me, self)
         for me in te.findall('member')
     ]
+    # Built in reverse so duplicate names resolve to the first member.
+    self._members_by_name = {m.name: m for m in reversed(self.members)}
     self.extendedby = []
 
     # Get a list of structs this struct can extend.
@@ -546,21 +639,24 @@ class Struct(Type):
     self.structextends = [x for x in structextends.split(',') if x]
 
   def find_member(self, name: str) -> Optional[Field]:
-    for m in self.members:
-      if m.name == name:
-        return m
-    return None
+    return self._members_by_name.get(name)
 
 
 class Command:
+
+  __slots__ = ('name', 'return_type', 'parameters', '_parameters_by_name',
+               'successcodes', 'errorcodes', 'extensions', 'feature',
+               'xml_node', 'is_instance')
+
   # Given a command element, parses into a Command type
   def __init__(self, registry, ce):
-    self.name = ce.find('proto/name').text
+    self.name = sys.intern(ce.find('proto/name').text)
     self.return_type = registry.types[ce.find('proto/type').text]
     self.parameters = [
         parse_parameter_or_member(registry, me, self)
         for me in ce.findall('param')
     ]
+    self._parameters_by_name = {p.name: p for p in reversed(self.parameters)}
     successcodes = ce.get('successcodes')
     if successcodes is not None:
       self.successcodes = successcodes.split(',')
@@ -576,10 +672,7 @@ class Command:
     self.xml_node = ce
 
   def find_parameter(self, name: str) -> Optional[Field]:
-    for p in self.parameters:
-      if p.name == name:
-        return p
-    return None
+    return self._parameters_by_name.get(name)
 
   def __str__(self):
     return self.name
@@ -587,77 +680,91 @@ class Command:
 
 class Extension:
 
+  __slots__ = ('name', 'number', 'type', 'author', 'supported', 'promotedto',
+               'deprecatedby', 'platform', 'requires', 'specialuse',
+               'name_enum', 'spec_version_enum', 'types', 'commands',
+               'xml_node')
+
   def __init__(self, registry, en):
-    self.name = en.get('name')
+    self.name = sys.intern(en.get('name'))
     self.number = int(en.get('number'))
     self.type = en.get('type', '')
-    self.author = en.get('author', '')
-    self.supported = en.get('supported', '')
+    self.author = sys.intern(en.get('author', ''))
+    self.supported = sys.intern(en.get('supported', ''))
     self.promotedto = en.get('promotedto', '')
     self.deprecatedby = en.get('deprecatedby', '')
-    self.platform = en.get('platform', '')
+    self.platform = sys.intern(en.get('platform', ''))
     self.requires = [x for x in en.get('requires', '').split(',') if x]
     self.specialuse = [x for x in en.get('specialuse', '').split(',') if x]
 
-    # Read extension name and spec version enums.
-    for ee in [t.get('name') for t in en.findall('require/enum[@value]')]:
-      if ee.endswith('_EXTENSION_NAME'):
-        self.name_enum = ee
-      elif ee.endswith('_SPEC_VERSION'):
-        self.spec_version_enum = ee
-
-    self.types = [t.get('name') for t in en.findall('require/type')]
-    self.commands = [t.get('name') for t in en.findall('require/command')]
+    self.types = []
+    self.commands = []
     self.xml_node = en
 
-    # We tag types and commands to extensions for filtering.
-    for t in self.types:
-      registry.types[t].extensions.append(self)
-
-    for c in self.commands:
-      registry.commands[c].extensions.append(self)
-
-    # Next we parse the enums, however instead of associating the enums
-    # with the extension we just expand the enum types as extra enum values
-    # should be harmless and aren't really enabled by extensions anyways.
-    for ee in en.findall('require/enum[@extends]'):
-      ev = parse_enum_extend(registry, ee, self.number)
-      ev.extensions.append(self)
+    # The require blocks are walked once, handling each child by its tag.
+    for ee in en.iterfind('require/*'):
+      tag = ee.tag
+      # We tag types and commands to extensions for filtering.
+      if tag == 'type':
+        name = sys.intern(ee.get('name'))
+        self.types.append(name)
+        registry.types[name].extensions.append(self)
+      elif tag == 'command':
+        name = sys.intern(ee.get('name'))
+        self.commands.append(name)
+        registry.commands[name].extensions.append(self)
+      elif tag == 'enum':
+        # Read extension name and spec version enums.
+        if ee.get('value') is not None:
+          name = ee.get('name')
+          if name.endswith('_EXTENSION_NAME'):
+            self.name_enum = name
+          elif name.endswith('_SPEC_VERSION'):
+            self.spec_version_enum = name
+
+        # Next we parse the enums, however instead of associating the enums
+        # with the extension we just expand the enum types as extra enum
+        # values should be harmless and aren't really enabled by extensions
+        # anyways.
+        if ee.get('extends') is not None:
+          ev = parse_enum_extend(registry, ee, self.number)
+          ev.extensions.append(self)
 
   def __str__(self):
     return self.name
 
 
 def PrintField(field):
-  s = '\t'
+  # The field is printed in pieces, collected here and joined once.
+  parts = ['\t']
 
   def PrintFieldType(t):
     if isinstance(t, Pointer):
       PrintFieldType(t.base_type)
       if t.is_const:
-        s += ' const'
-      s += '*'
-    elif isinstance(t, DynamicArray) or isinstance(t, FixedArray):
+        parts.append(' const')
+      parts.append('*')
+    elif isinstance(t, (DynamicArray, FixedArray)):
       PrintFieldType(t.base_type)
     elif isinstance(t, NextPtr):
       if t.is_const:
-        s += 'void const*'
+        parts.append('void const*')
       else:
-        s += 'void *'
+        parts.append('void *')
     else:
-      s += t.name
+      parts.append(t.name)
 
   PrintFieldType(field.type)
 
-  s = s + ' ' + field.name
+  parts.append(' ' + field.name)
 
-  if isinstance(field.type, DynamicArray) or isinstance(t, FixedArray):
-    s = s + f'[{field.type.length}]'
+  if isinstance(field.type, (DynamicArray, FixedArray)):
+    parts.append(f'[{field.type.length}]')
   if field.is_optional:
-    s = s + ' (optional)'
+    parts.append(' (optional)')
   if field.is_output:
-    s = s + ' =>output'
-  print(s)
+    parts.append(' =>output')
+  print(''.join(parts))
 
 
 def PrintType(t):
@@ -698,6 +805,8 @@ def PrintType(t):
 # Represents a define type in Vulkan registry.
 class Define(Type):
 
+  __slots__ = ('tail', 'text')
+
   def __init__(self, registry, te):
     if 'name' in te.attrib:
       super().__init__(te.attrib['name'], te)
@@ -724,6 +833,10 @@ class Registry:
     self.commands = {}
     self.extensions = {}
     self.aliases = {}
+    self.type_aliases = {}
+    self.base_type_aliases = {}
+    # Registry types grouped by class for JinjaEnvironment, built on first use.
+    self._types_by_kind = None
     self.platforms = {}
     self.constants = {}
 
@@ -733,6 +846,10 @@ class Registry:
     self.vk_api_version_patch = 0
 
     root = ET.parse(registry_file).getroot()
+    # The parsed elements are kept alive by the xml_node of every type, so the
+    # tree can't be streamed and cleared; release the unused sections instead.
+    for section in [e for e in root if e.tag not in _REGISTRY_SECTIONS]:
+      root.remove(section)
 
     # Set the default scope to core platform
     if platforms is None:
@@ -752,12 +869,26 @@ class Registry:
       authors.extend([p.get('name') for p in root.findall('tags/tag[@name]')])
     if VULKAN_ALL_SUPPORTED in supported:
       supported = ['vulkan', 'disabled']
+    # A single supported value may be given as a plain string.
+    if isinstance(supported, str):
+      supported = [supported]
+
+    # The filters are only used for membership tests while filtering.
+    platforms = frozenset(sys.intern(p) for p in platforms)
+    authors = frozenset(sys.intern(a) for a in authors)
+    supported = frozenset(sys.intern(s) for s in supported)
     # Add the core platform here to keep it first in dictionary.
     if '' in platforms:
       self.platforms[''] = None
 
     self.__parse(root)
 
+    # Everything the registry needs has been read from the document. Types,
+    # commands, extensions and platforms hold on to their own element, so
+    # only the rest of the tree (features, tags, section wrappers) is freed.
+    root.clear()
+    del root
+
     if allowed_extensions is None:
       allowed_extensions = set()
     elif VULKAN_ALL_EXTENSIONS in allowed_extensions:
@@ -777,6 +908,14 @@ class Registry:
     self.__filter_registry(platforms, authors, supported, allowed_extensions,
                            blocked_extensions)
 
+    # Index the type aliases that survived filtering, and the subset of them
+    # that alias base types, so users don't have to scan all the types.
+    for (name, t) in self.types.items():
+      if isinstance(t, TypeAlias):
+        self.type_aliases[name] = t
+        if t.is_base_type_alias:
+          self.base_type_aliases[name] = t
+
     # Add the default non-platform specific platform.
     # We do this post-filter to make sure we only include filtered types and commands.
     if '' in platforms:
@@ -796,10 +935,14 @@ class Registry:
         self.vk_api_version_patch = int(dfn.tail)
 
   def __parse(self, root):
+    # Shared TypeRef for each base type name of members and parameters.
+    self._type_refs = {}
     self.__parse_basetypes(root)
     self.__parse_enums(root)
     self.__parse_types(root)
     self.__parse_commands(root)
+    # All members and parameters have been resolved by now.
+    del self._type_refs
     self.__parse_extensions(root)
     self.__parse_features(root)
     self.__parse_platforms(root)
@@ -812,7 +955,7 @@ class Registry:
     for te in root.findall("types/type"):
       if te.get('category') is not None:
         if te.get('category') == 'basetype':
-          name = te.find('name').text
+          name = sys.intern(te.find('name').text)
           tte = te.find('type')
           if tte is not None:
             self.types[name] = TypeAlias(name, TypeRef(tte.text))
@@ -820,7 +963,7 @@ class Registry:
             self.types[name] = BaseType(name, te)
       else:
         # Catch the non-base type types.
-        name = te.get('name')
+        name = sys.intern(te.get('name'))
         self.types[name] = BaseType(name, te)
 
   def __parse_enums(self, root):
@@ -843,7 +986,7 @@ class Registry:
       # Aliased types point to their alias.
       # Aliases a
       if te.get('alias') is not None:
-        name = te.get('name')
+        name = sys.intern(te.get('name'))
         alias = te.get('alias')
         at = TypeAlias(name, self.types[alias])
         self.types[name] = at
@@ -882,15 +1025,14 @@ class Registry:
     # Struct extends are in text, convert to types
     for t in self.types.values():
       if isinstance(t, Struct):
-        for se in t.structextends:
-          et = self.types[se]
-          # Check for duplicates (which can be caused by aliasing)
-          if t not in et.extendedby:
-            et.extendedby.append(t)
-
         # convert struct extends to type ref (not just name)
         t.structextends = [self.types[se] for se in t.structextends]
 
+        # Each struct is visited once, so skipping duplicates (which can be
+        # caused by aliasing) in its own list keeps every extendedby unique.
+        for et in dict.fromkeys(t.structextends):
+          et.extendedby.append(t)
+
   # Resolve all TypeRef in the given type. Recurses if needed.
   def __resolve_typeref(self, t):
     if isinstance(t, TypeRef):
@@ -903,13 +1045,13 @@ class Registry:
         else:
           t.parent = self.__resolve_typeref(t.parent)
     # TODO IndirectType base? (pointer, array, fixedarray?)
-    elif isinstance(t, DynamicArray) or isinstance(t, FixedArray) or isinstance(
-        t, Pointer):
+    elif isinstance(t, (DynamicArray, FixedArray, Pointer)):
       t.base_type = self.__resolve_typeref(t.base_type)
     # Resolve TypeRefs for struct fields.
     elif isinstance(t, Struct):
+      resolve = self.__resolve_typeref
       for m in t.members:
-        m.type = self.__resolve_typeref(m.type)
+        m.type = resolve(m.type)
     elif isinstance(t, TypeAlias):
       t.alias = self.__resolve_typeref(t.alias)
     return t
@@ -918,7 +1060,7 @@ class Registry:
     # Parse all the commands.
     for ce in root.findall('commands/command'):
       if ce.get('alias') is not None:
-        name = ce.get('name')
+        name = sys.intern(ce.get('name'))
         alias = ce.get('alias')
         # print("cmd alias: " + name + "->" + alias)
         self.commands[name] = self.commands[alias]
@@ -929,9 +1071,10 @@ class Registry:
         self.commands[cmd.name] = cmd
 
     # Resolve all type refs and determine if instance or device
+    resolve = self.__resolve_typeref
     for cmd in self.commands.values():
       for p in cmd.parameters:
-        p.type = self.__resolve_typeref(p.type)
+        p.type = resolve(p.type)
 
       # Determine if this is an 'instance' command, used for
       # dispatch tables other layer related queries.
@@ -994,64 +1137,25 @@ class Registry:
 
     return extensions
 
-  # When filtering types we may need to modify the type, in which case
-  # we create a copy of the type first and modify that.
-  def __filter_type(self, t, platforms, extension_authors, supported):
-    if not isinstance(t, Enum):
-      return t
-
-    # Copy the Enum and then filter values
-    enum = copy.copy(t)
-    enum.values = {}
-    for (en, ev) in t.values.items():
-      # TODO can we share this filter better?
-      # TODO cleaner to make a list of extensions and intersect?
-      if len(ev.extensions) > 0:
-        for x in ev.extensions:
-          if (x.platform in platforms and x.supported in supported and
-              (extension_authors is None or x.author in extension_authors)):
-            enum.values[en] = ev
-            break
-      # No extension, core.
-      elif extension_authors is None or '' in extension_authors:
-        enum.values[en] = ev
-
-    return enum
-
   # Filter a single type, modifying if needed.
+  # Entries without extensions are core and are always kept. For the others,
+  # isdisjoint walks their (short) extension list and stops at the first
+  # selected extension, without building an intersection.
   def __filter_type_by_extensions(self, t, extension_set):
     if isinstance(t, Struct):
       # filter up the extendedby and structextends lists
+      def keep(eb):
+        return len(
+            eb.extensions) == 0 or not extension_set.isdisjoint(eb.extensions)
 
-      extendedby = []
-      for eb in t.extendedby:
-        if len(eb.extensions) > 0:
-          if len(extension_set.intersection(eb.extensions)) > 0:
-            extendedby.append(eb)
-        else:
-          extendedby.append(eb)
-
-      structextends = []
-      for eb in t.structextends:
-        if len(eb.extensions) > 0:
-          if len(extension_set.intersection(eb.extensions)) > 0:
-            structextends.append(eb)
-        else:
-          structextends.append(eb)
-
-      t.extendedby = extendedby
-      t.structextends = structextends
-
-      return t
+      t.extendedby = [eb for eb in t.extendedby if keep(eb)]
+      t.structextends = [eb for eb in t.structextends if keep(eb)]
     elif isinstance(t, Enum):
       # filter the extension values
-      for en in list(t.values):
-        ev = t.values[en]
-
-        # If this is part of an extension, check it meets our filter.
-        if len(ev.extensions) > 0:
-          if len(extension_set.intersection(ev.extensions)) == 0:
-            del t.values[en]
+      t.values = {
+          en: ev for (en, ev) in t.values.items() if len(ev.extensions) == 0 or
+          not extension_set.isdisjoint(ev.extensions)
+      }
 
     return t
 
@@ -1060,117 +1164,117 @@ class Registry:
                         allowed_extensions, blocked_extensions):
     filtered_ex = self.__select_extensions(platforms, extension_authors,
                                            supported)
-    filtered_set = set(filtered_ex)
-    filtered_set = filtered_set.union(allowed_extensions)
-    filtered_set = filtered_set.difference(blocked_extensions)
+    # The selected extensions don't change during filtering.
+    filtered_set = frozenset(filtered_ex).union(allowed_extensions).difference(
+        blocked_extensions)
 
     # Filter extensions.
-    self.extensions = {
-        k: v for (k, v) in self.extensions.items() if v in filtered_set
-    }
+    # filtered_set only holds registry extensions, so when it is as large as
+    # the registry's, every extension is kept.
+    if len(filtered_set) < len(self.extensions):
+      self.extensions = {
+          k: v for (k, v) in self.extensions.items() if v in filtered_set
+      }
 
     # Filter platforms.
     self.platforms = {
         k: v for (k, v) in self.platforms.items() if k in platforms
     }
 
-    # Filter all the types.
-    for tname in list(self.types):
-      t = self.types[tname]
-
-      # If this is part of an extension, check it meets our filter.
-      if len(t.extensions) > 0:
-        if len(filtered_set.intersection(t.extensions)) > 0:
-          self.types[tname] = self.__filter_type_by_extensions(t, filtered_set)
-        else:
-          del self.types[tname]
+    # Each extension lists the names of the types and commands it was tagged
+    # on while parsing, so the ones tagged with a selected extension are
+    # gathered from the selected extensions alone.
+    kept_types = {self.types[n] for x in filtered_set for n in x.types}
+    kept_commands = {self.commands[n] for x in filtered_set for n in x.commands}
+    # Types and commands without an extension are core.
+    keep_core = extension_authors is None or '' in extension_authors
 
-      # No extension, core?
-      elif extension_authors is None or '' in extension_authors:
-        self.types[tname] = self.__filter_type_by_extensions(t, filtered_set)
-      # Drop.
-      else:
-        del self.types[tname]
+    # Filter all the types.
+    self.types = {
+        k: t
+        for (k, t) in self.types.items()
+        if t in kept_types or (keep_core and len(t.extensions) == 0)
+    }
+    for t in self.types.values():
+      self.__filter_type_by_extensions(t, filtered_set)
 
     # Filter all the commands.
-    for tname in list(self.commands):
-      t = self.commands[tname]
-
-      # If this is part of an extension, check it meets our filter.
-      if len(t.extensions) > 0:
-        if len(filtered_set.intersection(t.extensions)) > 0:
-          self.commands[tname] = t
-        else:
-          del self.commands[tname]
-
-      # No extension, core?
-      elif extension_authors is None or '' in extension_authors:
-        self.commands[tname] = t
-      # Drop.
-      else:
-        del self.commands[tname]
+    self.commands = {
+        k: t
+        for (k, t) in self.commands.items()
+        if t in kept_commands or (keep_core and len(t.extensions) == 0)
+    }
 
 
 # Removes all type aliases from the dictionary.
 # Item (key, value) will have the condition: key == value.name
 def resolve_aliases(aliased: dict, resolve_base_type_aliases: bool = False):
+  # The alias chain is only walked when base type aliases are kept.
   return {
       value.name: value
-      for (key, value) in aliased.items()
+      for value in aliased.values()
       if not isinstance(value, TypeAlias) or
-      (value.is_base_type_alias and not resolve_base_type_aliases)
+      (not resolve_base_type_aliases and value.is_base_type_alias)
   }
 
 
+# The vkapi classes made available to Jinja2 templates, both as globals and
+# as tests (e.g. `{% if t is Struct %}`).
+_JINJA_TYPES = (Type, TypeAlias, BaseType, Struct, FunctionPtr, Handle, Enum,
+                Bitmask, EnumValue, Field, TypeModifier, Pointer, DynamicArray,
+                FixedArray, NextPtr)
+
+
+def _type_test(t):
+  return lambda v: isinstance(v, t)
+
+
+# The tests and globals don't depend on the registry, so they are built once
+# and shared by every environment.
+_JINJA_TESTS = {t.__name__: _type_test(t) for t in _JINJA_TYPES}
+_JINJA_GLOBALS = {
+    'isinstance': isinstance,
+    **{
+        t.__name__: t for t in _JINJA_TYPES
+    }
+}
+
+
 # Returns a Jinja2 Environment initialized with vkapi types and some
 # functions useful for working with the Registry in Jinja2
 def JinjaEnvironment(registry, *args, **kwargs):
+  # Imported here so that users of the Registry alone don't need Jinja2.
+  import jinja2
   env = jinja2.Environment(*args, **kwargs)
 
-  def type_test(t):
-    return lambda v: isinstance(v, t)
-
-  env.tests.update(
-      Type=type_test(Type),
-      TypeAlias=type_test(TypeAlias),
-      BaseType=type_test(BaseType),
-      Struct=type_test(Struct),
-      FunctionPtr=type_test(FunctionPtr),
-      Handle=type_test(Handle),
-      Enum=type_test(Enum),
-      Bitmask=type_test(Bitmask),
-      EnumValue=type_test(EnumValue),
-      Field=type_test(Field),
-      TypeModifier=type_test(TypeModifier),
-      Pointer=type_test(Pointer),
-      DynamicArray=type_test(DynamicArray),
-      FixedArray=type_test(FixedArray),
-      NextPtr=type_test(NextPtr),
-  )
-
-  env.globals.update(
-      registry=registry,
-      isinstance=isinstance,
-      constants=registry.constants,
-      Type=Type,
-      TypeAlias=TypeAlias,
-      BaseType=BaseType,
-      Struct=Struct,
-      FunctionPtr=FunctionPtr,
-      Handle=Handle,
-      Enum=Enum,
-      Bitmask=Bitmask,
-      EnumValue=EnumValue,
-      Field=Field,
-      TypeModifier=TypeModifier,
-      Pointer=Pointer,
-      DynamicArray=DynamicArray,
-      FixedArray=FixedArray,
-      NextPtr=NextPtr,
-  )
+  env.tests.update(_JINJA_TESTS)
+  env.globals.update(_JINJA_GLOBALS,
+                     registry=registry,
+                     constants=registry.constants)
+
+  # The types of each kind, sorted into their lists in a single pass. A type
+  # is added for every kind in its class hierarchy, as isinstance would.
+  # The registry doesn't change once built, so the lists are kept on it as
+  # tuples, which every environment created for it can share without one
+  # template's changes showing up in another's.
+  types_by_kind = registry._types_by_kind
+  if types_by_kind is None:
+    lists_by_kind = {
+        kind: [] for kind in (TypeAlias, BaseType, Struct, FunctionPtr, Handle,
+                             Enum, Bitmask, EnumValue, Field, TypeModifier,
+                             Pointer, DynamicArray, FixedArray)
+    }
+    for t in registry.types.values():
+      for cls in type(t).__mro__:
+        kind_types = lists_by_kind.get(cls)
+        if kind_types is not None:
+          kind_types.append(t)
+    types_by_kind = registry._types_by_kind = {
+        kind: tuple(kind_types) for (kind, kind_types) in lists_by_kind.items()
+    }
 
   def filtered_types(type_kind):
-    return [t for t in registry.types.values() if isinstance(t, type_kind)]
+    return types_by_kind[type_kind]
 
   def command_or_alias(name, cmd):
     if name == cmd.name: